@@ -0,0 +1,121 @@
+import os
+import json
+import tarfile
+import zipfile
+
+# Session exports can be read directly from these archive types
+archive_suffixes = (".zip", ".tar.gz", ".tgz", ".tar")
+
+
+# Check whether a path points to a supported archive file
+def is_archive(path):
+    return path.lower().endswith(archive_suffixes) and os.path.isfile(path)
+
+
+# Split "exports/user1.zip/userActions/Entities" into the archive path and the path inside it
+def split_archive_path(path):
+    parts = os.path.normpath(path).split(os.sep)
+    for i in range(len(parts), 0, -1):
+        candidate = os.sep.join(parts[:i]) or os.sep
+        if is_archive(candidate):
+            return candidate, "/".join(parts[i:])
+    return None, path
+
+
+# Member names are compared without a leading "./" and with "/" separators
+def normalize_member_name(name):
+    name = name.replace("\\", "/")
+    while name.startswith("./"):
+        name = name[2:]
+    return name.strip("/")
+
+
+# Yield (name, raw bytes) for every JSON member, in archive order, without writing to disk
+def stream_archive_members(archive_path):
+    if archive_path.lower().endswith(".zip"):
+        with zipfile.ZipFile(archive_path) as archive:
+            for info in archive.infolist():
+                if not info.is_dir() and info.filename.endswith(".json"):
+                    yield normalize_member_name(info.filename), archive.read(info)
+    else:
+        # "r|*" reads the tar as a forward-only stream, so .tar.gz is decompressed exactly once
+        with tarfile.open(archive_path, "r|*") as archive:
+            for member in archive:
+                if member.isfile() and member.name.endswith(".json"):
+                    yield normalize_member_name(member.name), archive.extractfile(member).read()
+
+
+# List the member names of an archive (zip central directory or tar headers) without keeping any contents
+def list_archive_members(archive_path):
+    if archive_path.lower().endswith(".zip"):
+        with zipfile.ZipFile(archive_path) as archive:
+            return [normalize_member_name(name) for name in archive.namelist()]
+    with tarfile.open(archive_path, "r|*") as archive:
+        return [normalize_member_name(member.name) for member in archive]
+
+
+# The archive currently being read: its raw member bytes and directory listings.
+# Only one archive is held at a time, so each cohort worker keeps at most one user in memory.
+loaded_archive = {"path": None, "members": {}, "listings": {}}
+
+
+# Read every JSON member of an archive once; members are decoded only when they are requested
+def load_archive(archive_path):
+    if loaded_archive["path"] == archive_path:
+        return loaded_archive["members"], loaded_archive["listings"]
+
+    release_archive()
+    members = dict(stream_archive_members(archive_path))
+
+    # Index directory listings so os.listdir-style loops work inside the archive
+    listings = {}
+    for name in members:
+        parts = name.split("/")
+        for depth in range(len(parts)):
+            directory = "/".join(parts[:depth])
+            listings.setdefault(directory, [])
+            if parts[depth] not in listings[directory]:
+                listings[directory].append(parts[depth])
+
+    loaded_archive.update(path=archive_path, members=members, listings=listings)
+    return members, listings
+
+
+# Drop the archive held in memory
+def release_archive():
+    loaded_archive.update(path=None, members={}, listings={})
+
+
+# Load a JSON file from disk or from inside an archive
+def read_json(file_path):
+    archive_path, inner_path = split_archive_path(file_path)
+    if archive_path is None:
+        with open(file_path, 'r', encoding='utf-8') as f:
+            return json.load(f)
+
+    members, _ = load_archive(archive_path)
+    if inner_path not in members:
+        raise FileNotFoundError(file_path)
+    return json.loads(members[inner_path].decode('utf-8'))
+
+
+# List a directory on disk or inside an archive
+def list_dir(folder_path):
+    archive_path, inner_path = split_archive_path(folder_path)
+    if archive_path is None:
+        return os.listdir(folder_path)
+
+    _, listings = load_archive(archive_path)
+    if inner_path not in listings:
+        raise FileNotFoundError(folder_path)
+    return list(listings[inner_path])
+
+
+# Check whether a file exists on disk or inside an archive
+def path_exists(file_path):
+    archive_path, inner_path = split_archive_path(file_path)
+    if archive_path is None:
+        return os.path.exists(file_path)
+
+    members, listings = load_archive(archive_path)
+    return inner_path in members or inner_path in listings
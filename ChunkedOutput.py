@@ -0,0 +1,126 @@
+import os
+import numpy as np
+import pandas as pd
+
+
+# Open an appendable output; the format follows the extension (.parquet, .csv or .xlsx)
+def open_chunked_output(output_file, columns, numeric_columns):
+    output = {
+        "path": output_file,
+        "format": os.path.splitext(output_file)[1].lower(),
+        "columns": list(columns),
+        "numeric_columns": list(numeric_columns),
+        "rows_written": 0,
+        "writer": None,
+    }
+    if output["format"] == ".parquet":
+        try:
+            import pyarrow  # noqa: F401
+        except ImportError:
+            raise ImportError("Writing .parquet output requires pyarrow: pip install pyarrow")
+    elif output["format"] == ".xlsx":
+        from openpyxl import Workbook
+
+        # Write-only workbooks stream rows to a temporary file instead of keeping them in memory
+        output["writer"] = Workbook(write_only=True)
+        output["sheet"] = output["writer"].create_sheet()
+        output["sheet"].append(output["columns"])
+    elif output["format"] != ".csv":
+        raise ValueError(f"Unsupported chunked output format: {output_file}")
+    return output
+
+
+# Append one batch of full-width rows to the output
+def write_chunk(output, rows):
+    if not rows:
+        return
+    chunk_df = pd.DataFrame(rows, columns=output["columns"])
+    chunk_df[output["numeric_columns"]] = chunk_df[output["numeric_columns"]].astype(float)
+
+    if output["format"] == ".parquet":
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+
+        table = pa.Table.from_pandas(chunk_df, preserve_index=False)
+        if output["writer"] is None:
+            output["writer"] = pq.ParquetWriter(output["path"], table.schema)
+        output["writer"].write_table(table.cast(output["writer"].schema))  # One row group per chunk
+    elif output["format"] == ".xlsx":
+        for row in chunk_df.itertuples(index=False):
+            output["sheet"].append([None if isinstance(value, float) and np.isnan(value) else value
+                                    for value in row])
+    else:
+        chunk_df.to_csv(output["path"], mode='w' if output["rows_written"] == 0 else 'a',
+                        header=output["rows_written"] == 0, index=False)
+    output["rows_written"] += len(rows)
+
+
+# Finish the output file
+def close_chunked_output(output):
+    if output["format"] == ".parquet" and output["writer"] is not None:
+        output["writer"].close()
+    elif output["format"] == ".xlsx":
+        output["writer"].save(output["path"])
+    elif output["format"] == ".csv" and output["rows_written"] == 0:
+        pd.DataFrame(columns=output["columns"]).to_csv(output["path"], index=False)
+
+
+# Streaming partial sums for np.nanmean over the numeric columns
+def create_running_mean(numeric_columns):
+    return {
+        "columns": list(numeric_columns),
+        "sums": np.zeros(len(numeric_columns)),
+        "counts": np.zeros(len(numeric_columns), dtype=np.int64),
+    }
+
+
+# Add one batch of numeric values (rows x columns) to the partial sums
+def update_running_mean(running_mean, values):
+    values = np.asarray(values, dtype=float).reshape(-1, len(running_mean["columns"]))
+    valid = ~np.isnan(values)
+    running_mean["sums"] += np.where(valid, values, 0.0).sum(axis=0)
+    running_mean["counts"] += valid.sum(axis=0)
+
+
+# Final column means; NaN where a column had no values, as np.nanmean gives
+def get_running_mean(running_mean):
+    with np.errstate(divide='ignore', invalid='ignore'):
+        means = running_mean["sums"] / running_mean["counts"]
+    return dict(zip(running_mean["columns"], np.where(running_mean["counts"] > 0, means, np.nan)))
+
+
+# Write rows in batches of chunk_size while keeping the running column means
+def create_chunked_writer(output_file, columns, numeric_columns, chunk_size):
+    return {
+        "output": open_chunked_output(output_file, columns, numeric_columns),
+        "running_mean": create_running_mean(numeric_columns),
+        "numeric_indexes": [list(columns).index(column) for column in numeric_columns],
+        "chunk_size": chunk_size,
+        "buffer": [],
+    }
+
+
+# Buffer one row and flush a full batch
+def add_row(writer, row):
+    writer["buffer"].append(row)
+    if len(writer["buffer"]) >= writer["chunk_size"]:
+        flush_rows(writer)
+
+
+# Write the buffered rows and fold them into the running means
+def flush_rows(writer):
+    if not writer["buffer"]:
+        return
+    # Rows with missing files are shorter than the header; pad them like pandas does
+    column_count = len(writer["output"]["columns"])
+    padded = [list(row) + [np.nan] * (column_count - len(row)) for row in writer["buffer"]]
+    update_running_mean(writer["running_mean"], [[row[i] for i in writer["numeric_indexes"]] for row in padded])
+    write_chunk(writer["output"], padded)
+    writer["buffer"] = []
+
+
+# Flush the last batch, close the file and return the final column means
+def close_chunked_writer(writer):
+    flush_rows(writer)
+    close_chunked_output(writer["output"])
+    return get_running_mean(writer["running_mean"])
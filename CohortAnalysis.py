@@ -0,0 +1,213 @@
+import os
+from collections import Counter
+from concurrent.futures import ProcessPoolExecutor
+import numpy as np
+import pandas as pd
+
+from ArchiveReader import (read_json, list_dir, path_exists, is_archive, release_archive, list_archive_members,
+                           split_archive_path, archive_suffixes)
+from EntityAnalysis import (build_entity_index, process_json_files, get_Entity_Accuracy, get_Entity_Precision,
+                            get_Entity_Recall, get_Entity_F1)
+from SamplingAnalysis import discover_files, read_sampled_unit
+from ScoreAnalysis import get_sc
+from TextAnalysis import dimensions
+
+# Per-file metrics averaged over files
+file_metrics = ["SV", "Review_TAR", "Suggestion_TAR", "Review_TS", "Suggestion_TS"]
+
+
+# Trees a user directory (or archive) must contain
+user_trees = ["userActionsEveryRounds", "userActions"]
+
+
+# Find the user directories (or user archives) under the cohort root
+# Archives are checked by member names only; an archive holding a single top-level folder
+# (u9.zip containing u9/userActions/...) is read from that folder
+def discover_users(root_dir):
+    users = []
+    for name in sorted(os.listdir(root_dir)):
+        user_path = os.path.join(root_dir, name)
+        if os.path.isdir(user_path):
+            if any(os.path.exists(os.path.join(user_path, tree)) for tree in user_trees):
+                users.append(user_path)
+                continue
+        elif is_archive(user_path):
+            members = [member.split("/") for member in list_archive_members(user_path) if member]
+            if any(parts[0] in user_trees for parts in members):
+                users.append(user_path)
+                continue
+            top_levels = {parts[0] for parts in members}
+            if len(top_levels) == 1 and any(len(parts) > 1 and parts[1] in user_trees for parts in members):
+                users.append(os.path.join(user_path, top_levels.pop()))
+                continue
+        print(f"Skipping {user_path}: no {' or '.join(user_trees)} folder found")
+    return users
+
+
+# User ID from its directory or archive name
+def get_user_id(user_path):
+    archive_path, _ = split_archive_path(user_path)
+    name = os.path.basename(os.path.normpath(archive_path or user_path))
+    for suffix in archive_suffixes:
+        if name.lower().endswith(suffix):
+            return name[:-len(suffix)]
+    return name
+
+
+# Empty partial result; partials of different users are merged by adding their fields
+def empty_partial():
+    return {
+        "users": [],
+        "pairs": Counter(),  # (image, dimension, original score, current score) -> number of rounds
+        "file_metrics": {},  # (metric, image, dimension) -> [sum, count]
+        "style": {},  # image -> [files, files with a removed style]
+        "entities": {},  # image -> [TP, FP, FN, MR]
+    }
+
+
+# Add a value to a [sum, count] or list-of-counts entry
+def add_to(table, key, values):
+    current = table.setdefault(key, [0] * len(values))
+    for i, value in enumerate(values):
+        current[i] += value
+
+
+# Map step: compute the mergeable partial of one user (runs in a worker process)
+def compute_user_partial(user_path):
+    partial = empty_partial()
+    user_id = get_user_id(user_path)
+    partial["users"].append(user_id)
+    print(f"Processing user: {user_id}")
+
+    score_review_dir = os.path.join(user_path, "userActionsEveryRounds", "score_Review")
+    suggestion_dir = os.path.join(user_path, "userActionsEveryRounds", "suggestion")
+    if path_exists(score_review_dir):
+        for dimension, images in discover_files(score_review_dir, "score_Review").items():
+            for image in images:
+                unit = read_sampled_unit(score_review_dir, suggestion_dir, image, dimension)
+                for original, current in unit["pairs"]:
+                    partial["pairs"][(image, dimension, original, current)] += 1
+                for metric in file_metrics:
+                    if not np.isnan(unit[metric]):
+                        add_to(partial["file_metrics"], (metric, image, dimension), [unit[metric], 1])
+
+    entity_dir = os.path.join(user_path, "userActions", "Entities")
+    if path_exists(entity_dir):
+        entity_index = build_entity_index(entity_dir)
+        for file_name in sorted(list_dir(entity_dir)):
+            if not file_name.endswith('_labels.json'):
+                continue
+            image = file_name[:-len('_labels.json')]
+            file_path = os.path.join(entity_dir, file_name)
+            style_removed = read_json(file_path).get("style", {}).get("removed", [])
+            add_to(partial["style"], image, [1, 1 if style_removed else 0])
+            add_to(partial["entities"], image, list(process_json_files(file_path, entity_index)))
+
+    release_archive()  # Workers are reused for the next user
+    return partial
+
+
+# Reduce step: merge one partial into another
+def merge_partials(partial, other):
+    partial["users"].extend(other["users"])
+    partial["pairs"].update(other["pairs"])
+    for table in ["file_metrics", "style", "entities"]:
+        for key, values in other[table].items():
+            add_to(partial[table], key, values)
+    return partial
+
+
+# SC/SD/SV/TAR/TS rows of a partial, grouped by dimension (and by image when by_image is set)
+def summarize_scores(partial, by_image=False):
+    pairs = {}
+    for (image, dimension, original, current), count in partial["pairs"].items():
+        group = (image, dimension) if by_image else (dimension,)
+        pairs.setdefault(group, []).append((original, current, count))
+    sums = {}
+    for (metric, image, dimension), values in partial["file_metrics"].items():
+        group = (image, dimension) if by_image else (dimension,)
+        add_to(sums, (metric,) + group, values)
+
+    groups = sorted(set(pairs) | {key[1:] for key in sums},
+                    key=lambda group: tuple(dimensions.index(g) if g in dimensions else g for g in group))
+    results = []
+    for group in groups:
+        row = {'image': group[0], 'dimension': group[1]} if by_image else {'dimension': group[0]}
+        group_pairs = pairs.get(group, [])
+        counts = np.array([count for _, _, count in group_pairs], dtype=int)
+        original_scores = np.repeat(np.array([original for original, _, _ in group_pairs], dtype=float), counts)
+        current_scores = np.repeat(np.array([current for _, current, _ in group_pairs], dtype=float), counts)
+        row['SC'] = get_sc(original_scores, current_scores) if len(original_scores) > 1 else np.nan
+        row['SD'] = np.abs(original_scores - current_scores).mean() if len(original_scores) else np.nan
+        for metric in file_metrics:
+            total, count = sums.get((metric,) + group, [0, 0])
+            row[metric] = total / count if count else np.nan
+        results.append(row)
+    return results
+
+
+# ASS and entity metrics of a set of [files, removed] / [TP, FP, FN, MR] entries
+def summarize_entities(style_counts, entity_counts):
+    N = sum(counts[0] for counts in style_counts)
+    D = sum(counts[1] for counts in style_counts)
+    TP, FP, FN, MR = [sum(counts[i] for counts in entity_counts) for i in range(4)]
+    Precision = get_Entity_Precision(TP, FP, MR)
+    Recall = get_Entity_Recall(TP, FN, MR)
+    return {
+        'ASS': 1 - (D / N) if N > 0 else np.nan,
+        'TP': TP, 'FP': FP, 'FN': FN, 'MR': MR,
+        'Accuracy': get_Entity_Accuracy(TP, FP, FN, MR),
+        'Precision': Precision,
+        'Recall': Recall,
+        'F1': get_Entity_F1(Precision, Recall),
+    }
+
+
+# Run every user in its own worker process and reduce the partials into cohort tables
+def cohort_analysis(root_dir, output_file, max_workers=None):
+    user_paths = discover_users(root_dir)
+    if not user_paths:
+        print(f"No user directories found in: {root_dir}")
+        return
+
+    release_archive()  # Forked workers must not inherit an archive held by the parent
+
+    cohort = empty_partial()
+    per_user_scores = []
+    per_user_entities = []
+    with ProcessPoolExecutor(max_workers=max_workers) as executor:
+        for partial in executor.map(compute_user_partial, user_paths):
+            user_id = partial["users"][0]
+            per_user_scores.extend({'user': user_id, **row} for row in summarize_scores(partial))
+            per_user_entities.append({'user': user_id, **summarize_entities(partial["style"].values(),
+                                                                            partial["entities"].values())})
+            merge_partials(cohort, partial)
+
+    images = sorted(set(cohort["style"]) | set(cohort["entities"]), key=lambda image: (len(image), image))
+    per_image_entities = [{'image': image, **summarize_entities([cohort["style"].get(image, [0, 0])],
+                                                                [cohort["entities"].get(image, [0, 0, 0, 0])])}
+                          for image in images]
+
+    tables = {
+        "Cohort_Scores": pd.DataFrame(summarize_scores(cohort)),
+        "PerUser_Scores": pd.DataFrame(per_user_scores),
+        "PerImage_Scores": pd.DataFrame(summarize_scores(cohort, by_image=True)),
+        "Cohort_Entities": pd.DataFrame([{'users': len(cohort["users"]),
+                                          **summarize_entities(cohort["style"].values(),
+                                                               cohort["entities"].values())}]),
+        "PerUser_Entities": pd.DataFrame(per_user_entities),
+        "PerImage_Entities": pd.DataFrame(per_image_entities),
+    }
+    with pd.ExcelWriter(output_file) as writer:
+        for sheet_name, table in tables.items():
+            table.to_excel(writer, sheet_name=sheet_name, index=False)
+    print(f"Cohort results for {len(cohort['users'])} users have been saved to: {output_file}")
+    return tables
+
+
+# Main function
+if __name__ == "__main__":
+    cohort_root_directory = "cohort"  # One userActions/userActionsEveryRounds tree (or archive) per user
+    output_file_cohort = "Cohort_Results.xlsx"
+
+    cohort_analysis(cohort_root_directory, output_file_cohort)
@@ -0,0 +1,213 @@
+import os
+import numpy as np
+import pandas as pd
+import matplotlib.pyplot as plt
+
+from GetSV import calculate_sv
+from SamplingAnalysis import discover_files
+from TextAnalysis import dimensions, load_json_data, get_tar, get_ts
+
+# Per-file metrics arranged as image x dimension matrices
+correlation_metrics = ["SD", "SV", "TAR", "TS"]
+
+
+# Calculate SD, SV, TAR and TS of one (image, dimension) pair
+def compute_file_metrics(score_review_file, suggestion_file):
+    metrics = {metric: np.nan for metric in correlation_metrics}
+    tar_values = []
+    ts_values = []
+
+    score_review_data = load_json_data(score_review_file)
+    if score_review_data:
+        score_diffs = []
+        for round_data in score_review_data:
+            if round_data["round"] == 1:
+                continue  # Skip initial round 1 data
+            gpt_score = round_data['data']['scores']['original']
+            user_score = round_data['data']['scores']['current']
+            if gpt_score is not None and user_score is not None:
+                score_diffs.append(abs(float(gpt_score) - float(user_score)))
+        if score_diffs:
+            metrics["SD"] = np.mean(score_diffs)
+        metrics["SV"] = calculate_sv(score_review_data)
+        tar_values.append(get_tar(score_review_data))
+        ts_values.append(get_ts(score_review_data))
+
+    suggestion_data = load_json_data(suggestion_file)
+    if suggestion_data:
+        tar_values.append(get_tar(suggestion_data))
+        ts_values.append(get_ts(suggestion_data))
+
+    # TAR and TS combine the review and the suggestion of the dimension
+    if not np.all(np.isnan(tar_values)):
+        metrics["TAR"] = np.nanmean(tar_values)
+    if not np.all(np.isnan(ts_values)):
+        metrics["TS"] = np.nanmean(ts_values)
+    return metrics
+
+
+# Build one image x dimension matrix per metric
+def build_metric_matrices(score_review_dir, suggestion_dir, images=None):
+    if images is None:
+        discovered = discover_files(score_review_dir, "score_Review")
+        images = sorted({image for dimension_images in discovered.values() for image in dimension_images},
+                        key=lambda image: (len(image), image))
+
+    matrices = {metric: pd.DataFrame(np.nan, index=list(images), columns=dimensions) for metric in correlation_metrics}
+    for image in images:
+        print(f"Processing image: {image}")
+        for dimension in dimensions:
+            score_review_file = os.path.join(score_review_dir, f"{image}_{dimension}_score_Review.json")
+            suggestion_file = os.path.join(suggestion_dir, f"{image}_{dimension}_suggestion.json")
+            file_metrics = compute_file_metrics(score_review_file, suggestion_file)
+            for metric in correlation_metrics:
+                matrices[metric].loc[image, dimension] = file_metrics[metric]
+    return matrices
+
+
+# Pairwise-complete sums for every pair of columns, computed with matrix products
+def get_pairwise_sums(values):
+    values = np.asarray(values, dtype=float)
+    valid = (~np.isnan(values)).astype(float)
+    filled = np.where(np.isnan(values), 0.0, values)
+    return {
+        "n": valid.T @ valid,
+        "sx": filled.T @ valid,  # sx[i, j]: sum of column i over rows where columns i and j are both present
+        "sxx": (filled ** 2).T @ valid,
+        "sxy": filled.T @ filled,
+    }
+
+
+# Sums are additive, so new images can be merged into existing ones (Pearson only)
+def merge_pairwise_sums(sums, new_sums):
+    return {key: sums[key] + new_sums[key] for key in sums}
+
+
+# Pairs where a correlation is undefined: fewer than 2 shared images, or a column that is constant on them.
+# The variance check is relative to the sum of squares, so it does not depend on n or on the scale of the values
+def get_undefined_pairs(sums):
+    n, sx, sxx = sums["n"], sums["sx"], sums["sxx"]
+    with np.errstate(divide='ignore', invalid='ignore'):
+        var_x = sxx - sx ** 2 / n
+    constant = ~(var_x > 1e-10 * sxx)
+    return (n < 2) | constant | constant.T
+
+
+# Pearson correlation matrix from pairwise sums
+def pearson_from_sums(sums):
+    n, sx, sxx, sxy = sums["n"], sums["sx"], sums["sxx"], sums["sxy"]
+    with np.errstate(divide='ignore', invalid='ignore'):
+        cov = sxy - sx * sx.T / n
+        var_x = sxx - sx ** 2 / n
+        corr = cov / np.sqrt(var_x * var_x.T)
+    corr[get_undefined_pairs(sums)] = np.nan
+    return np.clip(corr, -1, 1)
+
+
+# Calculate the 9x9 Pearson and Spearman matrices of one metric matrix
+def get_correlation_matrices(matrix, sums=None):
+    if sums is None:
+        sums = get_pairwise_sums(matrix.values)
+    pearson = pd.DataFrame(pearson_from_sums(sums), index=matrix.columns, columns=matrix.columns)
+
+    # Spearman ranks each pair of dimensions on the images where both are present; ranks change
+    # when images are added, so it is recomputed from the matrix rather than updated.
+    # Rounding turns floating-point noise (e.g. cosine similarities of 0.9999999999999999) into ties,
+    # and the pairs Pearson treats as constant are undefined for Spearman too
+    spearman = matrix.astype(float).round(12).corr(method='spearman')
+    spearman = spearman.mask(get_undefined_pairs(sums))
+    return pearson, spearman
+
+
+# Start a correlation state from metric matrices
+def create_correlation_state(matrices):
+    return {
+        "matrices": matrices,
+        "sums": {metric: get_pairwise_sums(matrix.values) for metric, matrix in matrices.items()},
+    }
+
+
+# Add the matrices of new images to a correlation state
+def update_correlation_state(state, new_matrices):
+    for metric, new_matrix in new_matrices.items():
+        new_matrix = new_matrix[~new_matrix.index.isin(state["matrices"][metric].index)]
+        if new_matrix.empty:
+            continue
+        state["matrices"][metric] = pd.concat([state["matrices"][metric], new_matrix])
+        state["sums"][metric] = merge_pairwise_sums(state["sums"][metric], get_pairwise_sums(new_matrix.values))
+    return state
+
+
+# Load the metric matrices saved by a previous run
+def load_correlation_state(output_file):
+    sheets = pd.read_excel(output_file, sheet_name=[f"{metric}_matrix" for metric in correlation_metrics],
+                           index_col=0)
+    return create_correlation_state({metric: sheets[f"{metric}_matrix"] for metric in correlation_metrics})
+
+
+# Draw a correlation heatmap
+def plot_correlation_heatmap(corr, title, output_file):
+    fig, ax = plt.subplots(figsize=(8, 7))
+    image = ax.imshow(corr.values, cmap="RdBu_r", vmin=-1, vmax=1)
+    ax.set_xticks(range(len(corr.columns)))
+    ax.set_yticks(range(len(corr.index)))
+    ax.set_xticklabels(corr.columns, rotation=45, ha="right")
+    ax.set_yticklabels(corr.index)
+    for i in range(len(corr.index)):
+        for j in range(len(corr.columns)):
+            value = corr.values[i, j]
+            if not np.isnan(value):
+                ax.text(j, i, f"{value:.2f}", ha="center", va="center", fontsize=7)
+    fig.colorbar(image, ax=ax)
+    ax.set_title(title)
+    fig.tight_layout()
+    fig.savefig(output_file, dpi=150)
+    plt.close(fig)
+
+
+# Write the matrices, the correlation matrices and the heatmaps
+def export_correlations(state, output_file, heatmap_dir):
+    os.makedirs(heatmap_dir, exist_ok=True)
+    with pd.ExcelWriter(output_file) as writer:
+        for metric in correlation_metrics:
+            matrix = state["matrices"][metric]
+            pearson, spearman = get_correlation_matrices(matrix, state["sums"][metric])
+            matrix.to_excel(writer, sheet_name=f"{metric}_matrix")
+            pearson.to_excel(writer, sheet_name=f"{metric}_pearson")
+            spearman.to_excel(writer, sheet_name=f"{metric}_spearman")
+
+            plot_correlation_heatmap(pearson, f"{metric} Pearson correlation",
+                                     os.path.join(heatmap_dir, f"{metric}_pearson.png"))
+            plot_correlation_heatmap(spearman, f"{metric} Spearman correlation",
+                                     os.path.join(heatmap_dir, f"{metric}_spearman.png"))
+    print(f"Correlation results have been saved to: {output_file}")
+    print(f"Correlation heatmaps have been saved to: {heatmap_dir}")
+
+
+# Correlate the 9 dimensions; with incremental=True only images missing from output_file are processed
+def correlation_analysis(score_review_dir, suggestion_dir, output_file, heatmap_dir, incremental=False):
+    if incremental and os.path.exists(output_file):
+        state = load_correlation_state(output_file)
+        discovered = discover_files(score_review_dir, "score_Review")
+        known_images = set(state["matrices"][correlation_metrics[0]].index)
+        new_images = sorted({image for dimension_images in discovered.values() for image in dimension_images
+                             if image not in known_images}, key=lambda image: (len(image), image))
+        print(f"Adding {len(new_images)} new images to {len(known_images)} existing images")
+        if new_images:
+            update_correlation_state(state, build_metric_matrices(score_review_dir, suggestion_dir, new_images))
+    else:
+        state = create_correlation_state(build_metric_matrices(score_review_dir, suggestion_dir))
+
+    export_correlations(state, output_file, heatmap_dir)
+    return state
+
+
+# Main function
+if __name__ == "__main__":
+    score_review_directory = "userActionsEveryRounds/score_Review"  # Path to score review JSON files
+    suggestion_directory = "userActionsEveryRounds/suggestion"  # Path to suggestion JSON files
+    output_file_correlation = "Correlation_Results.xlsx"
+    heatmap_directory = "Correlation_Heatmaps"
+
+    correlation_analysis(score_review_directory, suggestion_directory, output_file_correlation, heatmap_directory,
+                         incremental=True)
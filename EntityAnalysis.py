@@ -1,16 +1,117 @@
 import os
-import json
+from collections import Counter
 
-def process_json_files(file_path):
-    if not os.path.exists(file_path):
+from ArchiveReader import read_json, list_dir, path_exists
+
+# Minimum trigram (Dice) similarity for an added label to count as a replacement of a removed one
+match_threshold = 0.4
+
+def get_trigrams(label):
+    # Lowercase, collapse whitespace and pad so short labels and word starts still produce trigrams
+    text = "  " + " ".join(label.lower().split()) + " "
+    return {text[i:i + 3] for i in range(len(text) - 2)}
+
+def build_trigram_index(labels):
+    # Intern each distinct label once with its trigram set
+    index = {"ids": {}, "labels": [], "trigrams": []}
+    for label in labels:
+        if label in index["ids"]:
+            continue
+        index["ids"][label] = len(index["labels"])
+        index["labels"].append(label)
+        index["trigrams"].append(get_trigrams(label))
+    return index
+
+def build_entity_index(folder_path):
+    # Intern every added and removed label of the whole Entities corpus once
+    labels = []
+    for file_name in sorted(list_dir(folder_path)):
+        if file_name.endswith('_labels.json'):
+            json_data = read_json(os.path.join(folder_path, file_name))
+            labels.extend(json_data.get("added", []))
+            labels.extend(json_data.get("removed", []))
+    return build_trigram_index(labels)
+
+def get_label_trigrams(label, index):
+    label_id = index["ids"].get(label)
+    return get_trigrams(label) if label_id is None else index["trigrams"][label_id]
+
+def find_augmenting_path(start, edges, match_of_added):
+    # Breadth-first search over alternating paths from an unmatched removed label
+    parent = {}  # added index -> removed index it was reached from
+    queue = [start]
+    for removed_index in queue:
+        for added_index in edges[removed_index]:
+            if added_index in parent:
+                continue
+            parent[added_index] = removed_index
+            if match_of_added[added_index] is None:
+                return added_index, parent
+            queue.append(match_of_added[added_index])
+    return None, parent
+
+def match_entities(W, R, index, threshold=match_threshold):
+    # Pair removed labels with the added labels that replace them. The pairing has the largest
+    # possible number of matches, so MR does not depend on the order the pairs are tried in.
+    # Candidates come from postings over this file's added labels only, so the cost of a file
+    # does not depend on the size of the corpus
+    added_labels = list(dict.fromkeys(R))
+    added_trigrams = [get_label_trigrams(label, index) for label in added_labels]
+    postings = {}
+    for position, trigrams in enumerate(added_trigrams):
+        for trigram in trigrams:
+            postings.setdefault(trigram, []).append(position)
+
+    similarities = {}  # removed label -> [(similarity, added label position)], most similar first
+    for removed in dict.fromkeys(W):
+        removed_trigrams = get_label_trigrams(removed, index)
+        shared = Counter()
+        for trigram in removed_trigrams:
+            for position in postings.get(trigram, []):
+                shared[position] += 1
+        candidates = []
+        for position, count in shared.items():
+            similarity = 2 * count / (len(removed_trigrams) + len(added_trigrams[position]))
+            if similarity >= threshold:
+                candidates.append((similarity, position))
+        similarities[removed] = sorted(candidates, key=lambda c: (-c[0], c[1]))
+
+    # Expand to one node per occurrence, since a label can be added or removed more than once
+    added_indexes = {}
+    for added_index, label in enumerate(R):
+        added_indexes.setdefault(label, []).append(added_index)
+    edges = [[added_index for _, position in similarities[removed]
+              for added_index in added_indexes[added_labels[position]]] for removed in W]
+    similarity_of = [{added_labels[position]: similarity for similarity, position in similarities[removed]}
+                     for removed in W]
+
+    # Augmenting paths give a maximum matching; trying the most similar labels first keeps close pairs together
+    match_of_added = [None] * len(R)
+    match_of_removed = [None] * len(W)
+    order = sorted(range(len(W)), key=lambda i: (-similarities[W[i]][0][0] if similarities[W[i]] else 0, i))
+    for start in order:
+        added_index, parent = find_augmenting_path(start, edges, match_of_added)
+        while added_index is not None:
+            removed_index = parent[added_index]
+            previous = match_of_removed[removed_index]
+            match_of_added[added_index] = removed_index
+            match_of_removed[removed_index] = added_index
+            added_index = None if removed_index == start else previous
+
+    return [(W[i], R[j], similarity_of[i][R[j]]) for i, j in enumerate(match_of_removed) if j is not None]
+
+def process_json_files(file_path, index=None, threshold=match_threshold):
+    if not path_exists(file_path):
         print(f"File {file_path} not found, skipping.")
-    with open(file_path, 'r', encoding='utf-8') as file:
-        json_data = json.load(file)
+    json_data = read_json(file_path)
     E = json_data.get("original", [])
     R = json_data.get("added", [])
     W = json_data.get("removed", [])
+    if index is None:
+        index = build_trigram_index(R + W)
+    matches = match_entities(W, R, index, threshold)
     TP = len(E) - len(W)
-    MR = min(len(W), len(R))
+    MR = len(matches)
     FP = max(0, len(W) - MR)
     FN = max(0, len(R) - MR)
     return TP, FP, FN, MR
@@ -1,8 +1,9 @@
 import os
-import json
 import numpy as np
 import pandas as pd
 
+from ArchiveReader import read_json
+
 # Dimension list
 dimensions = [
     "Realistic", "Deformation", "Imagination", "Color Richness",
@@ -13,8 +14,7 @@ dimensions = [
 # Load JSON file function
 def load_json_data(file_path):
     try:
-        with open(file_path, 'r', encoding='utf-8') as f:
-            return json.load(f)
+        return read_json(file_path)
     except FileNotFoundError:
         print(f"File not found: {file_path}")
         return None
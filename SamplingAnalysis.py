@@ -0,0 +1,227 @@
+import os
+import re
+import time
+import numpy as np
+import pandas as pd
+from scipy.stats import t as student_t
+
+from ArchiveReader import list_dir
+from GetSV import calculate_sv
+from ScoreAnalysis import get_sc
+from TextAnalysis import dimensions, load_json_data, get_tar, get_ts
+
+# File names look like "{image}.jpg_{dimension}_score_Review.json" / "{image}.jpg_{dimension}_suggestion.json"
+file_name_pattern = re.compile(r"^(?P<image>.+?\.jpg)_(?P<dimension>.+)_(?P<kind>score_Review|suggestion)\.json$")
+
+# Metrics estimated for every dimension
+sampled_metrics = ["SC", "SD", "Review_TAR", "Suggestion_TAR", "Review_TS", "Suggestion_TS"]
+
+
+# Discover the image names available for each dimension in a directory
+def discover_files(directory, kind):
+    discovered = {dimension: [] for dimension in dimensions}
+    for file_name in sorted(list_dir(directory)):
+        match = file_name_pattern.match(file_name)
+        if match and match.group("kind") == kind and match.group("dimension") in discovered:
+            discovered[match.group("dimension")].append(match.group("image"))
+    return discovered
+
+
+# Finite population correction for sampling n of N units without replacement
+def get_fpc(n, population):
+    if population <= 1:
+        return 0.0
+    return np.sqrt(max(population - n, 0) / (population - 1))
+
+
+# Mean of per-file values with a t confidence interval
+def mean_confidence_interval(values, population, confidence=0.95):
+    files_sampled = len(values)
+    values = np.asarray([v for v in values if not np.isnan(v)], dtype=float)
+    n = len(values)
+    if n == 0:
+        return np.nan, np.nan
+    mean = values.mean()
+    if files_sampled == population:
+        return mean, 0.0  # The whole population has been read
+    if n < 2:
+        return mean, np.nan
+    se = values.std(ddof=1) / np.sqrt(n) * get_fpc(files_sampled, population)
+    half_width = student_t.ppf((1 + confidence) / 2, n - 1) * se
+    return mean, half_width
+
+
+# Ratio estimator for SD: files are clusters of rounds, SD = total |diff| / total rounds
+def ratio_confidence_interval(diff_sums, round_counts, population, confidence=0.95):
+    diff_sums = np.asarray(diff_sums, dtype=float)
+    round_counts = np.asarray(round_counts, dtype=float)
+    n = len(diff_sums)
+    if n == 0 or round_counts.sum() == 0:
+        return np.nan, np.nan
+    ratio = diff_sums.sum() / round_counts.sum()
+    if n == population:
+        return ratio, 0.0
+    if n < 2:
+        return ratio, np.nan
+    residuals = diff_sums - ratio * round_counts
+    se = np.sqrt(residuals.var(ddof=1) / n) / round_counts.mean() * get_fpc(n, population)
+    half_width = student_t.ppf((1 + confidence) / 2, n - 1) * se
+    return ratio, half_width
+
+
+# Spearman correlation with a delete-one-file jackknife interval; files, not rounds, are the sampling unit
+# because rounds of one file repeat the same scores
+def spearman_confidence_interval(file_pairs, population, confidence=0.95):
+    files_sampled = len(file_pairs)
+    pairs = [pair for pairs_of_file in file_pairs for pair in pairs_of_file]
+    if len(pairs) < 2:
+        return np.nan, np.nan
+    sc = get_sc(np.array([pair[0] for pair in pairs]), np.array([pair[1] for pair in pairs]))
+    if np.isnan(sc):
+        return np.nan, np.nan
+    if files_sampled == population:
+        return sc, 0.0
+    if files_sampled < 3:
+        return sc, np.nan
+
+    leave_one_out = []
+    for i in range(files_sampled):
+        kept = [pair for j, pairs_of_file in enumerate(file_pairs) if j != i for pair in pairs_of_file]
+        if len(kept) < 2:
+            return sc, np.nan
+        leave_one_out.append(get_sc(np.array([pair[0] for pair in kept]), np.array([pair[1] for pair in kept])))
+    leave_one_out = np.asarray(leave_one_out, dtype=float)
+    if np.any(np.isnan(leave_one_out)):
+        return sc, np.nan  # Some subsample has constant scores, so the spread is unknown
+
+    se = np.sqrt((files_sampled - 1) / files_sampled * ((leave_one_out - leave_one_out.mean()) ** 2).sum())
+    se *= get_fpc(files_sampled, population)
+    half_width = student_t.ppf((1 + confidence) / 2, files_sampled - 1) * se
+    return sc, half_width
+
+
+# Read one sampled (image, dimension) unit and keep only what the estimators need
+def read_sampled_unit(score_review_dir, suggestion_dir, image, dimension):
+    unit = {"pairs": [], "SV": np.nan, "Review_TAR": np.nan, "Review_TS": np.nan,
+            "Suggestion_TAR": np.nan, "Suggestion_TS": np.nan}
+
+    score_review_data = load_json_data(os.path.join(score_review_dir, f"{image}_{dimension}_score_Review.json"))
+    if score_review_data:
+        for round_data in score_review_data:
+            if round_data["round"] == 1:
+                continue  # Skip initial round 1 data
+            gpt_score = round_data['data']['scores']['original']
+            user_score = round_data['data']['scores']['current']
+            if gpt_score is not None and user_score is not None:
+                unit["pairs"].append((float(gpt_score), float(user_score)))
+        unit["SV"] = calculate_sv(score_review_data)
+        unit["Review_TAR"] = get_tar(score_review_data)
+        unit["Review_TS"] = get_ts(score_review_data)
+
+    suggestion_data = load_json_data(os.path.join(suggestion_dir, f"{image}_{dimension}_suggestion.json"))
+    if suggestion_data:
+        unit["Suggestion_TAR"] = get_tar(suggestion_data)
+        unit["Suggestion_TS"] = get_ts(suggestion_data)
+
+    return unit
+
+
+# Estimate every metric of one dimension from its sampled units
+def estimate_dimension(units, population, confidence=0.95):
+    estimates = {
+        "SC": spearman_confidence_interval([unit["pairs"] for unit in units], population, confidence),
+        "SD": ratio_confidence_interval(
+            [sum(abs(o - c) for o, c in unit["pairs"]) for unit in units],
+            [len(unit["pairs"]) for unit in units],
+            population, confidence),
+    }
+    for metric in ["Review_TAR", "Suggestion_TAR", "Review_TS", "Suggestion_TS"]:
+        estimates[metric] = mean_confidence_interval([unit[metric] for unit in units], population, confidence)
+    return estimates
+
+
+# Check whether every metric of a dimension meets the target error
+def is_converged(estimates, target_error):
+    for estimate, half_width in estimates.values():
+        if np.isnan(estimate):
+            continue  # Metric has no data in this dimension
+        if np.isnan(half_width) or half_width > target_error:
+            return False
+    return True
+
+
+# Estimate SC, SD, TAR and TS from a stratified random sample of files per dimension
+def sampled_analysis(score_review_dir, suggestion_dir, output_file, sample_size=None, target_error=None,
+                     time_budget=None, confidence=0.95, batch_size=5, seed=None):
+    start_time = time.monotonic()
+    if sample_size is None and target_error is None and time_budget is None:
+        sample_size = 10  # Default to a small fixed sample per dimension
+
+    rng = np.random.default_rng(seed)
+    populations = discover_files(score_review_dir, "score_Review")
+
+    # Each dimension is a stratum; a random permutation gives sampling without replacement
+    sample_order = {dimension: [images[i] for i in rng.permutation(len(images))]
+                    for dimension, images in populations.items()}
+    sampled_units = {dimension: [] for dimension in dimensions}
+    estimates = {}
+    active = [dimension for dimension in dimensions if sample_order[dimension]]
+
+    while active:
+        for dimension in list(active):
+            taken = len(sampled_units[dimension])
+            take = batch_size
+            if sample_size is not None:
+                take = min(take, sample_size - taken)
+            for image in sample_order[dimension][taken:taken + take]:
+                sampled_units[dimension].append(
+                    read_sampled_unit(score_review_dir, suggestion_dir, image, dimension))
+
+            taken = len(sampled_units[dimension])
+            estimates[dimension] = estimate_dimension(sampled_units[dimension], len(populations[dimension]),
+                                                      confidence)
+
+            exhausted = taken >= len(sample_order[dimension])
+            reached_size = sample_size is not None and taken >= sample_size
+            converged = target_error is not None and is_converged(estimates[dimension], target_error)
+            if exhausted or reached_size or converged:
+                active.remove(dimension)
+
+        if time_budget is not None and time.monotonic() - start_time >= time_budget:
+            print(f"Time budget of {time_budget}s reached, stopping sampling")
+            break
+
+    # Collect estimates with their confidence intervals
+    results = []
+    for dimension in dimensions:
+        if dimension not in estimates:
+            continue
+        for metric in sampled_metrics:
+            estimate, half_width = estimates[dimension][metric]
+            results.append({
+                'dimension': dimension,
+                'metric': metric,
+                'estimate': estimate,
+                'ci_lower': estimate - half_width,
+                'ci_upper': estimate + half_width,
+                'half_width': half_width,
+                'files_sampled': len(sampled_units[dimension]),
+                'files_total': len(populations[dimension]),
+            })
+
+    results_df = pd.DataFrame(results)
+    results_df.to_excel(output_file, index=False)
+    print(f"Sampled results ({confidence:.0%} confidence) computed in {time.monotonic() - start_time:.2f}s "
+          f"have been saved to: {output_file}")
+    return results_df
+
+
+# Main function
+if __name__ == "__main__":
+    score_review_directory = "userActionsEveryRounds/score_Review"  # Path to score review JSON files
+    suggestion_directory = "userActionsEveryRounds/suggestion"  # Path to suggestion JSON files
+    output_file_sampled = "Sampled_Results.xlsx"
+
+    # Stop once every interval is within +/-0.05 or after 30 seconds, whichever comes first
+    sampled_analysis(score_review_directory, suggestion_directory, output_file_sampled,
+                     target_error=0.05, time_budget=30)
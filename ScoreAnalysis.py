@@ -1,9 +1,10 @@
 import os
-import json
 import numpy as np
 import pandas as pd
 from scipy.stats import spearmanr
 
+from ArchiveReader import read_json
+
 # Define dimensions
 dimensions = [
     "Realistic", "Deformation", "Imagination", "Color Richness",
@@ -14,8 +15,7 @@ dimensions = [
 # Load JSON file
 def load_json_data(file_path):
     try:
-        with open(file_path, 'r', encoding='utf-8') as f:
-            return json.load(f)
+        return read_json(file_path)
     except FileNotFoundError:
         print(f"File not found: {file_path}")
         return None
@@ -1,21 +1,21 @@
 import os
-import json
 import pandas as pd
 
+from ArchiveReader import read_json, list_dir
+
 folder_path = "userActions/Entities"
 def get_ass(folder_path, output_file):
     results = []  # Store file names and whether the deletion was detected (1 or 0)
     N = 0  # N: Total number of files
     D = 0  # D: Number of deletion operations
 
-    # Loop through all files in the folder
-    for file_name in os.listdir(folder_path):
+    # Loop through all files in the folder (or in the folder inside an archive)
+    for file_name in list_dir(folder_path):
         if file_name.endswith('_labels.json'):
             file_path = os.path.join(folder_path, file_name)
 
             # Load the JSON file
-            with open(file_path, 'r', encoding='utf-8') as f:
-                data = json.load(f)
+            data = read_json(file_path)
 
             # Check the 'removed' field in the 'style'
             style_removed = data.get("style", {}).get("removed", [])
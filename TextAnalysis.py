@@ -1,10 +1,15 @@
 import os
-import json
+import re
+from functools import partial
 import numpy as np
 import pandas as pd
 from sklearn.feature_extraction.text import CountVectorizer
 from sklearn.metrics.pairwise import cosine_similarity
 
+from ArchiveReader import read_json
+from ChunkedOutput import create_chunked_writer, add_row, close_chunked_writer
+from TextStore import text_sections, get_text, load_json_data_dedup
+
 
 # Define the normalize function
 def normalize(value, min_value, max_value):
@@ -24,8 +29,7 @@ dimensions = [
 # Load JSON file
 def load_json_data(file_path):
     try:
-        with open(file_path, 'r', encoding='utf-8') as f:
-            return json.load(f)
+        return read_json(file_path)
     except FileNotFoundError:
         print(f"File not found: {file_path}")
         return None
@@ -118,12 +122,17 @@ def get_ts(text_data):
     if not gpt_texts or not user_texts:
         return np.nan  # Return NaN if no data
 
+    return get_text_similarity(gpt_texts[-1], user_texts[-1])
+
+
+# Cosine similarity between a GPT text and a user text
+def get_text_similarity(gpt_text, user_text):
     # Use bag-of-words model to analyze based on words, not characters
-    vectorizer = CountVectorizer(analyzer='word', token_pattern=r"(?u)\b\w+\b").fit([gpt_texts[-1], user_texts[-1]])
+    vectorizer = CountVectorizer(analyzer='word', token_pattern=r"(?u)\b\w+\b").fit([gpt_text, user_text])
 
     # Vectorize the GPT and user texts
-    gpt_vector = vectorizer.transform([gpt_texts[-1]]).toarray()
-    user_vector = vectorizer.transform([user_texts[-1]]).toarray()
+    gpt_vector = vectorizer.transform([gpt_text]).toarray()
+    user_vector = vectorizer.transform([user_text]).toarray()
 
     if gpt_vector.shape[1] > 1 and user_vector.shape[1] > 1:
         similarity = cosine_similarity(gpt_vector, user_vector)[0][0]
@@ -131,51 +140,149 @@ def get_ts(text_data):
     return np.nan  # Return NaN if no data
 
 
+# Calculate TAR on rounds loaded with load_json_data_dedup (text fields hold text-store IDs)
+def get_tar_dedup(text_data, text_store):
+    total_tar = 0
+    valid_rounds = 0
+
+    for round_data in text_data:
+        if round_data.get("round") == 1:
+            continue  # Skip round 1
+
+        for section in text_sections:
+            section_ids = round_data.get('data', {}).get(section, None)
+            if not section_ids or section_ids.get('original') is None:
+                continue
+
+            # Unchanged text: nothing added or removed, so TAR is 1 without reading the strings
+            if section_ids.get('current') == section_ids['original'] and \
+                    section_ids.get('added') is None and section_ids.get('removed') is None:
+                total_tar += 1
+                valid_rounds += 1
+                continue
+
+            len_original = len(get_text(text_store, section_ids['original']))
+            len_added = len(get_text(text_store, section_ids.get('added')))
+            len_removed = len(get_text(text_store, section_ids.get('removed')))
+
+            denominator = len_added + len_original
+            if denominator > 0:
+                total_tar += (len_original - len_removed) / denominator
+                valid_rounds += 1
+
+    if valid_rounds == 0:
+        print("No valid rounds")
+        return np.nan  # Return NaN if no valid rounds
+
+    return total_tar / valid_rounds
+
+
+# Calculate TS on rounds loaded with load_json_data_dedup (text fields hold text-store IDs)
+def get_ts_dedup(text_data, text_store):
+    last_pair = None
+
+    for round_data in text_data:
+        if round_data["round"] == 1:
+            continue
+
+        for section in text_sections:
+            section_ids = round_data['data'].get(section, {})
+            if not section_ids:
+                continue
+            gpt_id = section_ids.get('original')
+            user_id = section_ids.get('current')
+            # Empty texts are stored as None, so the strings are only read for whitespace-only texts
+            if gpt_id is None or user_id is None:
+                continue
+            if get_text(text_store, gpt_id).strip() and \
+                    (user_id == gpt_id or get_text(text_store, user_id).strip()):
+                last_pair = (gpt_id, user_id)
+
+    if last_pair is None:
+        return np.nan  # Return NaN if no data
+
+    gpt_id, user_id = last_pair
+    if gpt_id == user_id:
+        # Identical texts: cosine similarity is 1, but get_ts gives NaN when the vocabulary has a single word
+        words = set(re.findall(r"(?u)\b\w+\b", get_text(text_store, gpt_id).lower()))
+        return 1.0 if len(words) > 1 else np.nan
+    return get_text_similarity(get_text(text_store, gpt_id), get_text(text_store, user_id))
+
+
 # Process directory and calculate TAR and TS
-def process_directory(score_comment_dir, suggestion_dir, output_file_tar, output_file_ts):
+# Pass a dict as text_store to hold each distinct review/suggestion text once across the corpus
+# Pass chunk_size to write rows in batches (.parquet/.csv/.xlsx) instead of keeping them all in memory
+def process_directory(score_comment_dir, suggestion_dir, output_file_tar, output_file_ts, text_store=None,
+                      chunk_size=None, image_nums=range(1, 21)):
     tar_results = []
     ts_results = []
 
-    for image_num in range(1, 21):  # Adjust based on actual range
-        tar_values = []
-        ts_values = []
+    # Define columns for Review and Suggestion TAR/TS for each dimension
+    tar_columns = ["File Name"] + [f"{dim}_Review_TAR" for dim in dimensions] + [f"{dim}_Suggestion_TAR" for dim in
+                                                                                 dimensions]
+    ts_columns = ["File Name"] + [f"{dim}_Review_TS" for dim in dimensions] + [f"{dim}_Suggestion_TS" for dim in
+                                                                               dimensions]
+
+    if chunk_size is not None:
+        tar_writer = create_chunked_writer(output_file_tar, tar_columns, tar_columns[1:], chunk_size)
+        ts_writer = create_chunked_writer(output_file_ts, ts_columns, ts_columns[1:], chunk_size)
+
+    if text_store is None:
+        load_data, tar_function, ts_function = load_json_data, get_tar, get_ts
+    else:
+        load_data = partial(load_json_data_dedup, text_store=text_store)
+        tar_function = partial(get_tar_dedup, text_store=text_store)
+        ts_function = partial(get_ts_dedup, text_store=text_store)
+
+    for image_num in image_nums:  # Adjust based on actual range
+        # Values are keyed by column name so each one lands under its own header
+        tar_values = {column: np.nan for column in tar_columns[1:]}
+        ts_values = {column: np.nan for column in ts_columns[1:]}
 
         for dimension in dimensions:
             # Process score_Review file
             score_comment_file = os.path.join(score_comment_dir, f"{image_num}.jpg_{dimension}_score_Review.json")
-            score_comment_data = load_json_data(score_comment_file)
+            score_comment_data = load_data(score_comment_file)
 
             if score_comment_data:
                 # Calculate TAR and TS for reviews
-                tar_value_review = get_tar(score_comment_data)
-                ts_value_review = get_ts(score_comment_data)
+                tar_value_review = tar_function(score_comment_data)
+                ts_value_review = ts_function(score_comment_data)
 
                 # Store the review results
-                tar_values.append(tar_value_review)
-                ts_values.append(ts_value_review)
+                tar_values[f"{dimension}_Review_TAR"] = tar_value_review
+                ts_values[f"{dimension}_Review_TS"] = ts_value_review
 
             # Process suggestions file
             suggestion_file = os.path.join(suggestion_dir, f"{image_num}.jpg_{dimension}_suggestion.json")
-            suggestion_data = load_json_data(suggestion_file)
+            suggestion_data = load_data(suggestion_file)
 
             if suggestion_data:
                 # Calculate TAR and TS for suggestions
-                tar_value_suggestion = get_tar(suggestion_data)
-                ts_value_suggestion = get_ts(suggestion_data)
+                tar_value_suggestion = tar_function(suggestion_data)
+                ts_value_suggestion = ts_function(suggestion_data)
 
                 # Store the suggestion results
-                tar_values.append(tar_value_suggestion)
-                ts_values.append(ts_value_suggestion)
-
-        # Append results for TAR and TS
-        tar_results.append([f"{image_num}.jpg"] + tar_values)
-        ts_results.append([f"{image_num}.jpg"] + ts_values)
-
-    # Define columns for Review and Suggestion TAR/TS for each dimension
-    tar_columns = ["File Name"] + [f"{dim}_Review_TAR" for dim in dimensions] + [f"{dim}_Suggestion_TAR" for dim in
-                                                                                 dimensions]
-    ts_columns = ["File Name"] + [f"{dim}_Review_TS" for dim in dimensions] + [f"{dim}_Suggestion_TS" for dim in
-                                                                               dimensions]
+                tar_values[f"{dimension}_Suggestion_TAR"] = tar_value_suggestion
+                ts_values[f"{dimension}_Suggestion_TS"] = ts_value_suggestion
+
+        # Append results for TAR and TS in column order
+        tar_row = [f"{image_num}.jpg"] + [tar_values[column] for column in tar_columns[1:]]
+        ts_row = [f"{image_num}.jpg"] + [ts_values[column] for column in ts_columns[1:]]
+        if chunk_size is not None:
+            add_row(tar_writer, tar_row)
+            add_row(ts_writer, ts_row)
+        else:
+            tar_results.append(tar_row)
+            ts_results.append(ts_row)
+
+    if chunk_size is not None:
+        # Column means come from the streamed partial sums, as np.nanmean over all rows would give
+        tar_means = close_chunked_writer(tar_writer)
+        print(f"TAR results have been saved to: {output_file_tar}")
+        ts_means = close_chunked_writer(ts_writer)
+        print(f"TS results have been saved to: {output_file_ts}")
+        return tar_means, ts_means
 
     # Save TAR results to Excel
     tar_df = pd.DataFrame(tar_results, columns=tar_columns)
@@ -0,0 +1,52 @@
+import hashlib
+
+from ArchiveReader import read_json
+
+# Text fields that repeat across rounds and are stored once
+text_fields = ["original", "current", "added", "removed"]
+text_sections = ["Reviews", "suggestions"]
+
+
+# Content-addressed ID of a text
+def get_text_id(text):
+    return hashlib.blake2b(text.encode('utf-8'), digest_size=16).hexdigest()
+
+
+# Store a text once and return its ID (empty texts are stored as None)
+def intern_text(text_store, text):
+    if not text:
+        return None
+    text_id = get_text_id(text)
+    if text_id not in text_store:
+        text_store[text_id] = text
+    return text_id
+
+
+# Look up the text behind an ID
+def get_text(text_store, text_id):
+    if text_id is None:
+        return ""
+    return text_store[text_id]
+
+
+# Load a round file, replacing review/suggestion texts with text-store IDs
+# Archive input still keeps the raw member bytes of the current archive until release_archive() is called
+def load_json_data_dedup(file_path, text_store):
+    try:
+        text_data = read_json(file_path)
+    except FileNotFoundError:
+        print(f"File not found: {file_path}")
+        return None
+
+    # Build new round records holding IDs in place of the texts
+    dedup_rounds = []
+    for round_data in text_data:
+        if not isinstance(round_data, dict):
+            continue
+        data = dict(round_data.get('data', {}))
+        for section in text_sections:
+            if data.get(section):
+                data[section] = {key: intern_text(text_store, value) if key in text_fields else value
+                                 for key, value in data[section].items()}
+        dedup_rounds.append({**round_data, 'data': data})
+    return dedup_rounds
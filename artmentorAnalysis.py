@@ -1,10 +1,10 @@
 import os
-import json
 import numpy as np
 import pandas as pd
 
 # Import methods from different analysis modules
-from EntityAnalysis import process_json_files, get_Entity_Accuracy, get_Entity_Precision, get_Entity_Recall, get_Entity_F1
+from ArchiveReader import read_json
+from EntityAnalysis import build_entity_index, process_json_files, get_Entity_Accuracy, get_Entity_Precision, get_Entity_Recall, get_Entity_F1
 from ScoreAnalysis import get_sc, get_sd, extract_scores
 from StyleAnalysis import get_ass
 from TextAnalysis import get_tar, get_ts, process_directory as process_text_analysis
@@ -12,8 +12,7 @@ from TextAnalysis import get_tar, get_ts, process_directory as process_text_anal
 # Function to load JSON files
 def load_json_data(file_path):
     try:
-        with open(file_path, 'r', encoding='utf-8') as f:
-            return json.load(f)
+        return read_json(file_path)
     except FileNotFoundError:
         print(f"File not found: {file_path}")
         return None
@@ -21,10 +20,12 @@ def load_json_data(file_path):
 # Process entity analysis and save results to Excel
 def process_entity_analysis(directory_path, output_file):
     entity_results = []
+    # Trigram index over all added labels, used to match removed labels to their replacements
+    entity_index = build_entity_index(directory_path)
     for i in range(1, 21):
         file_path = os.path.join(directory_path, f'{i}.jpg_labels.json')
         print(file_path)
-        TP, FP, FN, MR = process_json_files(file_path)
+        TP, FP, FN, MR = process_json_files(file_path, entity_index)
         print("TP", TP, "FP", FP, "FN", FN, "MR", MR)
         Accuracy = get_Entity_Accuracy(TP, FP, FN, MR)
         Precision = get_Entity_Precision(TP, FP, MR)
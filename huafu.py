@@ -1,5 +1,4 @@
 import os
-import json
 import numpy as np
 import matplotlib.pyplot as plt
 from matplotlib.colors import Normalize
@@ -9,6 +8,9 @@ from sklearn.metrics.pairwise import cosine_similarity
 from matplotlib.cm import ScalarMappable
 import pandas as pd  # 引入 pandas 库
 
+from ArchiveReader import read_json
+from ChunkedOutput import create_chunked_writer, add_row, close_chunked_writer
+
 
 # 自定义颜色映射，渐变从灰白色到深绿色
 cmap = plt.cm.get_cmap("Greens")  # 使用 Matplotlib 的 "Greens" 渐变色
@@ -25,8 +27,7 @@ dimensions = [
 # 1. 加载JSON数据
 def load_json_data(file_path):
     try:
-        with open(file_path, 'r', encoding='utf-8') as f:
-            return json.load(f)
+        return read_json(file_path)
     except FileNotFoundError:
         print(f"File not found: {file_path}")
         return None
@@ -186,10 +187,18 @@ def plot_custom_waffle_chart(image_metrics, metric_name):
 
     plt.show()
 
+# 导出表格的指标列
+metric_names = ["SC", "SV", "TAR", "TS", "SD"]
+
 # 9. 批量处理文件并计算每张图片的指标
-def process_directory(score_review_dir, suggestion_dir):
+# 指定 chunk_size 时按批写入 output_file（.parquet/.csv/.xlsx），不在内存中保留所有行
+def process_directory(score_review_dir, suggestion_dir, output_file="image_metrics.xlsx", chunk_size=None,
+                      image_nums=range(1, 21)):
     image_metrics = []
-    for image_num in range(1, 21):
+    if chunk_size is not None:
+        writer = create_chunked_writer(output_file, ["image"] + metric_names, metric_names, chunk_size)
+
+    for image_num in image_nums:
         sc_values, sv_values, tar_values, ts_values, sd_values = [], [], [], [], []
 
         for dimension in dimensions:
@@ -218,29 +227,44 @@ def process_directory(score_review_dir, suggestion_dir):
             # 打印每张图片的各个指标
             print(f"Image: {image_num}.jpg, SC: {avg_sc}, SV: {avg_sv}, TAR: {avg_tar}, TS: {avg_ts}, SD: {avg_sd}")
 
-            image_metrics.append({
+            metrics = {
                 "image": f"{image_num}.jpg",
                 "SC": avg_sc,
                 "SV": avg_sv,
                 "TAR": avg_tar,
                 "TS": avg_ts,
                 "SD": avg_sd
-            })
+            }
+            if chunk_size is not None:
+                add_row(writer, [metrics["image"]] + [metrics[name] for name in metric_names])
+            else:
+                image_metrics.append(metrics)
+
+    if chunk_size is not None:
+        # 由流式累加的部分和计算各指标的 np.nanmean 汇总值
+        metric_means = close_chunked_writer(writer)
+        print(f"Metrics exported to {output_file}")
+        print("Average metrics: " + ", ".join(f"{name}: {value}" for name, value in metric_means.items()))
+        return metric_means
 
         # 将结果保存到 DataFrame
-    df = pd.DataFrame(image_metrics)
+    df = pd.DataFrame(image_metrics, columns=["image"] + metric_names)
 
     # 导出到 Excel 文件
-    output_file = "image_metrics.xlsx"
     df.to_excel(output_file, index=False)
     print(f"Metrics exported to {output_file}")
 
+    # 与分块写出相同的 np.nanmean 汇总值
+    metric_means = {name: df[name].astype(float).mean() for name in metric_names}
+    print("Average metrics: " + ", ".join(f"{name}: {value}" for name, value in metric_means.items()))
+
     # 生成各项指标的华夫饼图
     plot_custom_waffle_chart(image_metrics, "SC")
     plot_custom_waffle_chart(image_metrics, "SV")
     plot_custom_waffle_chart(image_metrics, "TAR")
     plot_custom_waffle_chart(image_metrics, "TS")
     plot_custom_waffle_chart(image_metrics, "SD")
+    return metric_means
 
 
 # 主函数入口